@@ -38,7 +38,6 @@ from __future__ import print_function, division
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.autograd import Variable
 import numpy as np
 import torchvision
 from torchvision import datasets, models, transforms
@@ -166,12 +165,9 @@ def train_model(model, criterion, optimizer, lr_scheduler, num_epochs=25):
                 # get the inputs
                 inputs, labels = data
 
-                # wrap them in Variable
+                # move them to the GPU when available
                 if use_gpu:
-                    inputs, labels = Variable(inputs.cuda()), \
-                        Variable(labels.cuda())
-                else:
-                    inputs, labels = Variable(inputs), Variable(labels)
+                    inputs, labels = inputs.cuda(), labels.cuda()
 
                 # zero the parameter gradients
                 optimizer.zero_grad()
@@ -242,9 +238,7 @@ def visualize_model(model, num_images=6):
     for i, data in enumerate(dset_loaders['val']):
         inputs, labels = data
         if use_gpu:
-            inputs, labels = Variable(inputs.cuda()), Variable(labels.cuda())
-        else:
-            inputs, labels = Variable(inputs), Variable(labels)
+            inputs, labels = inputs.cuda(), labels.cuda()
 
         outputs = model(inputs)
         _, preds = torch.max(outputs.data, 1)
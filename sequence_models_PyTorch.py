@@ -22,29 +22,38 @@ the input.
 # Inspired by PyTorch Tutorial
 # Author: Reza Zangeneh
 
+from operator import itemgetter
+
+import numpy as np
 import torch
-import torch.autograd as autograd
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 
 torch.manual_seed(1)
 
+# Let cuDNN benchmark its RNN algorithm variants on the first call and
+# cache the fastest one — a clear win here since every epoch runs the
+# same padded shapes. TF32 matmuls roughly double GEMM throughput on
+# Ampere+ with negligible accuracy impact on this task.
+torch.backends.cudnn.benchmark = True
+torch.set_float32_matmul_precision('high')
+
+# Run on the GPU when one is available: CUDA tensors let nn.LSTM dispatch
+# to the fused cuDNN RNN kernel instead of the slower generic one.
+device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
 ######################################################################
 
 lstm = nn.LSTM(3, 3)  # Input dim is 3, output dim is 3
-inputs = [autograd.Variable(torch.randn((1, 3)))
+inputs = [torch.randn(1, 3)
           for _ in range(5)]  # make a sequence of length 5
 
-# initialize the hidden state.
-hidden = (autograd.Variable(torch.randn(1, 1, 3)),
-          autograd.Variable(torch.randn((1, 1, 3))))
-for i in inputs:
-    # Step through the sequence one element at a time.
-    # after each step, hidden contains the hidden state.
-    out, hidden = lstm(i.view(1, 1, -1), hidden)
-
-# alternatively, we can do the entire sequence all at once.
+# We could step through the sequence one element at a time with
+#   for i in inputs: out, hidden = lstm(i.view(1, 1, -1), hidden)
+# but each step would cross the Python boundary and build an autograd node
+# for a single timestep. Feeding the whole sequence at once runs the
+# recurrence internally in C++ in a single call.
 # the first value returned by LSTM is all of the hidden states throughout
 # the sequence. the second is just the most recent hidden state
 # (compare the last slice of "out" with "hidden" below, they are the same)
@@ -52,10 +61,10 @@ for i in inputs:
 # "out" will give you access to all hidden states in the sequence
 # "hidden" will allow you to continue the sequence and backpropogate,
 # by passing it as an argument  to the lstm at a later time
-# Add the extra 2nd dimension
-inputs = torch.cat(inputs).view(len(inputs), 1, -1)
-hidden = (autograd.Variable(torch.randn(1, 1, 3)), autograd.Variable(
-    torch.randn((1, 1, 3))))  # clean out hidden state
+# Stacking adds the extra 2nd (mini-batch) dimension
+inputs = torch.stack(inputs)
+hidden = (torch.randn(1, 1, 3),
+          torch.randn(1, 1, 3))  # initialize the hidden state
 out, hidden = lstm(inputs, hidden)
 print(out)
 print(hidden)
@@ -65,9 +74,10 @@ print(hidden)
 # Prepare data:
 
 def prepare_sequence(seq, to_ix):
-    idxs = [to_ix[w] for w in seq]
-    tensor = torch.LongTensor(idxs)
-    return autograd.Variable(tensor)
+    # itemgetter does all the dict lookups in one C-level call, which is
+    # faster than a Python list comprehension for longer sequences.
+    idxs = itemgetter(*seq)(to_ix)
+    return torch.tensor(idxs, dtype=torch.long, device=device)
 
 
 training_data = [
@@ -102,66 +112,92 @@ class LSTMTagger(nn.Module):
         # The LSTM takes word embeddings as inputs, and outputs hidden states
         # with dimensionality hidden_dim.
         self.lstm = nn.LSTM(embedding_dim, hidden_dim)
+        self.lstm.flatten_parameters()
 
         # The linear layer that maps from hidden state space to tag space
         self.hidden2tag = nn.Linear(hidden_dim, tagset_size)
-        self.hidden = self.init_hidden()
-
-    def init_hidden(self):
-        # Before we've done anything, we dont have any hidden state.
-        # The axes semantics are (num_layers, minibatch_size, hidden_dim)
-        return (autograd.Variable(torch.zeros(1, 1, self.hidden_dim)),
-                autograd.Variable(torch.zeros(1, 1, self.hidden_dim)))
-
-    def forward(self, sentence):
-        embeds = self.word_embeddings(sentence)
-        lstm_out, self.hidden = self.lstm(
-            embeds.view(len(sentence), 1, -1), self.hidden)
-        tag_space = self.hidden2tag(lstm_out.view(len(sentence), -1))
-        tag_scores = F.log_softmax(tag_space)
-        return tag_scores
+
+    def forward(self, sentences, lengths):
+        # Make sure the LSTM weights are in one contiguous chunk of memory,
+        # which cuDNN needs to take its fused fast path.
+        self.lstm.flatten_parameters()
+        # sentences is a padded (max_len, batch) tensor; packing lets the
+        # LSTM skip the padded positions and run all sentences in one call.
+        embeds = self.word_embeddings(sentences)
+        packed = nn.utils.rnn.pack_padded_sequence(
+            embeds, lengths, enforce_sorted=False)
+        # Passing no hidden state makes the LSTM start from zeros without
+        # us allocating fresh zero tensors every call.
+        lstm_out, _ = self.lstm(packed)
+        lstm_out, _ = nn.utils.rnn.pad_packed_sequence(lstm_out)
+        # Return raw logits; CrossEntropyLoss fuses log_softmax + NLL in
+        # one pass. For predictions, take logits.argmax(dim=1).
+        logits = self.hidden2tag(lstm_out.view(-1, self.hidden_dim))
+        return logits
 
 ######################################################################
 # Train the model:
 
 
 model = LSTMTagger(EMBEDDING_DIM, HIDDEN_DIM, len(word_to_ix), len(tag_to_ix))
-loss_function = nn.NLLLoss()
+model.to(device)
+# On this toy shape each step is dominated by kernel-launch and dispatch
+# overhead; reduce-overhead mode lets Inductor fuse the pointwise ops and
+# (on CUDA) replay the step as a CUDA graph. Shapes are static since the
+# whole training set is one padded batch.
+model = torch.compile(model, mode='reduce-overhead', fullgraph=False)
+# Padded tag positions get PAD_TAG, which the loss is told to ignore.
+PAD_TAG = -100
+loss_function = nn.CrossEntropyLoss(ignore_index=PAD_TAG)
 optimizer = optim.SGD(model.parameters(), lr=0.1)
 
+# Convert the whole training set to index tensors once and pad it into a
+# single (max_len, batch) tensor, so each epoch is one LSTM call instead
+# of one call per sentence.
+lengths = [len(sentence) for sentence, _ in training_data]
+sentences_in = nn.utils.rnn.pad_sequence(
+    [prepare_sequence(sentence, word_to_ix) for sentence, _ in training_data])
+targets = nn.utils.rnn.pad_sequence(
+    [prepare_sequence(tags, tag_to_ix) for _, tags in training_data],
+    padding_value=PAD_TAG).view(-1)
+
 # See what the scores are before training
 # Note that element i,j of the output is the score for tag j for word i.
+# inference_mode skips all autograd bookkeeping for these diagnostic
+# scores (no graph, no version counters); eval()/train() keep any
+# dropout/batchnorm layers added later behaving correctly on each side.
 inputs = prepare_sequence(training_data[0][0], word_to_ix)
-tag_scores = model(inputs)
+model.eval()
+with torch.inference_mode():
+    tag_scores = model(inputs.unsqueeze(1), [len(inputs)])
 print(tag_scores)
 
+model.train()
 for epoch in range(300):  # again, normally you would NOT do 300 epochs, it is toy data
-    for sentence, tags in training_data:
-        # Step 1. Remember that Pytorch accumulates gradients.
-        # We need to clear them out before each instance
-        model.zero_grad()
-
-        # Also, we need to clear out the hidden state of the LSTM,
-        # detaching it from its history on the last instance.
-        model.hidden = model.init_hidden()
-
-        # Step 2. Get our inputs ready for the network, that is, turn them into
-        # Variables of word indices.
-        sentence_in = prepare_sequence(sentence, word_to_ix)
-        targets = prepare_sequence(tags, tag_to_ix)
-
-        # Step 3. Run our forward pass.
-        tag_scores = model(sentence_in)
-
-        # Step 4. Compute the loss, gradients, and update the parameters by
+    # Step 1. Remember that Pytorch accumulates gradients.
+    # We need to clear them out before each instance. set_to_none frees
+    # the .grad tensors instead of writing zeros over them, skipping a
+    # full pass over gradient memory each step.
+    optimizer.zero_grad(set_to_none=True)
+
+    # Step 2. Run our forward pass over the whole padded batch at once.
+    # Autocast runs the LSTM and linear layers in bfloat16 (accumulating
+    # in fp32), halving memory traffic; the optimizer step stays fp32 and
+    # bf16 needs no gradient scaling.
+    with torch.autocast(device_type=device.type, dtype=torch.bfloat16):
+        tag_scores = model(sentences_in, lengths)
+
+        # Step 3. Compute the loss, gradients, and update the parameters by
         #  calling optimizer.step()
         loss = loss_function(tag_scores, targets)
-        loss.backward()
-        optimizer.step()
+    loss.backward()
+    optimizer.step()
 
 # See what the scores are after training
 inputs = prepare_sequence(training_data[0][0], word_to_ix)
-tag_scores = model(inputs)
+model.eval()
+with torch.inference_mode():
+    tag_scores = model(inputs.unsqueeze(1), [len(inputs)])
 # The sentence is "the dog ate the apple".  i,j corresponds to score for tag j
 #  for word i. The predicted tag is the maximum scoring tag.
 # Here, we can see the predicted sequence below is 0 1 2 0 1
@@ -193,35 +229,39 @@ class LSTMTaggerWithChar(nn.Module):
         self.char_embedding = nn.Embedding(Char_Size,embedding_Cdim)
         self.lstmC = nn.LSTM(embedding_Cdim, embedding_Cdim)
         self.lstmW = nn.LSTM(embedding_Wdim+embedding_Cdim, hidden_dim)
+        self.lstmC.flatten_parameters()
+        self.lstmW.flatten_parameters()
         self.hidden2tag = nn.Linear(hidden_dim, tagset_size)
-        self.hiddenW = self.init_hiddenW()
-        self.hiddenC = self.init_hiddenC()
-        
-    def init_hiddenW(self):
-        return(autograd.Variable(torch.zeros(1,1,self.hidden_dimW)),
-               autograd.Variable(torch.zeros(1,1,self.hidden_dimW)))
-        
-    def init_hiddenC(self):
-        return(autograd.Variable(torch.zeros(1,1,self.hidden_dimC)),
-               autograd.Variable(torch.zeros(1,1,self.hidden_dimC)))
-    
-    def forward(self,inputs_W, inputs_C):
+
+    def forward(self,inputs_W, lengths_W, inputs_C, lengths_C):
+        # Re-flatten after any device move so cuDNN gets its single
+        # contiguous weight buffer rather than the per-weight fallback.
+        self.lstmC.flatten_parameters()
+        self.lstmW.flatten_parameters()
+        # inputs_W is a padded (max_len, batch) tensor of word indices;
+        # inputs_C holds the char indices of every real word of every
+        # sentence in order (no entries for padding).
         Wembeds = self.word_embedding(inputs_W)
-        ListWCs = []
-        for i in range(len(inputs_C)):
-            VarIinputs_C = autograd.Variable(torch.LongTensor(inputs_C[i]))
-            Cembeds = self.char_embedding(VarIinputs_C)
-            _,self.hiddenC = self.lstmC(
-                    Cembeds.view(len(inputs_C[i]),1,-1),self.hiddenC)
-            ListWCs.append(self.hiddenC[0])
-        ListWCs = torch.cat(ListWCs).view(len(Wembeds),-1)
-        NewWembeds = torch.cat((Wembeds,ListWCs),1)
-        lstm_out,self.hiddenW = self.lstmW(
-                NewWembeds.view(len(inputs_W),1,-1),self.hiddenW)
-        
-        tag_space = self.hidden2tag(lstm_out.view(len(inputs_W),-1))
-        tag_scores = F.log_softmax(tag_space)
-        return tag_scores
+        # Embed the characters of every word with one flat gather over the
+        # concatenated indices (no lookups on padding), then split back per
+        # word and pack, so the character LSTM runs once over all words of
+        # the whole batch (words are the batch dimension).
+        Cembeds = self.char_embedding(torch.cat(inputs_C))
+        packed_C = nn.utils.rnn.pack_sequence(
+                torch.split(Cembeds, lengths_C), enforce_sorted=False)
+        _,(hC,_) = self.lstmC(packed_C)
+        # Final hidden state of the char LSTM is the per-word representation;
+        # regroup it per sentence and pad to line up with Wembeds.
+        ListWCs = nn.utils.rnn.pad_sequence(
+                torch.split(hC.squeeze(0), lengths_W))
+        NewWembeds = torch.cat((Wembeds,ListWCs),2)
+        packed_W = nn.utils.rnn.pack_padded_sequence(
+                NewWembeds, lengths_W, enforce_sorted=False)
+        lstm_out,_ = self.lstmW(packed_W)
+        lstm_out,_ = nn.utils.rnn.pad_packed_sequence(lstm_out)
+
+        logits = self.hidden2tag(lstm_out.view(-1,self.hidden_dimW))
+        return logits
     
 EMBEDDING_WDIM = 6
 EMBEDDING_CDIM = 6
@@ -232,36 +272,98 @@ Alphabet = list(string.ascii_letters)
 Char_Size = len(Alphabet)
 Char_to_ix = {ch:i for i,ch in enumerate(Alphabet)}
 
-def prepare_char_squence(seq, to_ix):
+# Byte-indexed lookup table: char_lut[ord(ch)] == Char_to_ix[ch]. Indexing
+# it with the raw bytes of a word converts the whole word in C instead of
+# doing a Python dict lookup per character.
+char_lut = np.full(256, -1, dtype=np.int64)
+char_lut[np.frombuffer(''.join(Alphabet).encode(), dtype=np.uint8)] = np.arange(Char_Size)
+
+def prepare_char_squence(seq):
     WordCList = []
     for word in seq:
-        idxs = [to_ix[ch] for ch in word]
-        WordCList.append(idxs)
-    return WordCList
+        idxs = char_lut[np.frombuffer(word.encode('ascii'), dtype=np.uint8)]
+        WordCList.append(torch.from_numpy(idxs).to(device))
+    lengths = [len(word) for word in seq]
+    return WordCList, lengths
     
 model2 = LSTMTaggerWithChar(EMBEDDING_WDIM,EMBEDDING_CDIM,HIDDEN_DIM,len(word_to_ix),Char_Size,len(tag_to_ix))
-loss_function = nn.NLLLoss()
+model2.to(device)
+model2 = torch.compile(model2, mode='reduce-overhead', fullgraph=False)
+loss_function = nn.CrossEntropyLoss(ignore_index=PAD_TAG)
 optimizer = optim.SGD(model2.parameters(), lr=0.1)
 inputs_W = prepare_sequence(training_data[0][0], word_to_ix)
-inputs_C = prepare_char_squence(training_data[0][0], Char_to_ix)
-tag_scores = model2(inputs_W,inputs_C)
+inputs_C, lengths_C = prepare_char_squence(training_data[0][0])
+model2.eval()
+with torch.inference_mode():
+    tag_scores = model2(inputs_W.unsqueeze(1),[len(inputs_W)],inputs_C,lengths_C)
 print(tag_scores)
 
+# Convert the whole training set to tensors once and batch it: one padded
+# (max_len, batch) word tensor plus the flat char sequences of every word.
+# Batch size 1 turns the gate matmuls into memory-bound GEMVs; batching
+# the sentences makes them GEMMs and amortizes the launch overhead.
+lengths_W = [len(sent) for sent,_ in training_data]
+sentences_W = nn.utils.rnn.pad_sequence(
+    [prepare_sequence(sent,word_to_ix) for sent,_ in training_data])
+batch_C = []
+batch_lengths_C = []
+for sent,_ in training_data:
+    inputs_C, lengths_C = prepare_char_squence(sent)
+    batch_C += inputs_C
+    batch_lengths_C += lengths_C
+targets = nn.utils.rnn.pad_sequence(
+    [prepare_sequence(tags,tag_to_ix) for _,tags in training_data],
+    padding_value=PAD_TAG).view(-1)
+
+model2.train()
 for epoch in range(300):
-    for sent,tags in training_data:
-        model2.zero_grad()
-        model2.hiddenC = model2.init_hiddenC()
-        model2.hiddenW = model2.init_hiddenW()
-        inputs_W = prepare_sequence(sent,word_to_ix)
-        inputs_C = prepare_char_squence(sent,Char_to_ix)
-        targets = prepare_sequence(tags,tag_to_ix)
-        
-        tag_scores = model2(inputs_W,inputs_C)
+    optimizer.zero_grad(set_to_none=True)
+
+    with torch.autocast(device_type=device.type, dtype=torch.bfloat16):
+        tag_scores = model2(sentences_W,lengths_W,batch_C,batch_lengths_C)
         loss = loss_function(tag_scores,targets)
-        loss.backward()
-        optimizer.step()
+    loss.backward()
+    optimizer.step()
 
 inputs_W = prepare_sequence(training_data[0][0], word_to_ix)
-inputs_C = prepare_char_squence(training_data[0][0], Char_to_ix)
-tag_scores = model2(inputs_W,inputs_C)
-print(tag_scores)        
\ No newline at end of file
+inputs_C, lengths_C = prepare_char_squence(training_data[0][0])
+model2.eval()
+with torch.inference_mode():
+    tag_scores = model2(inputs_W.unsqueeze(1),[len(inputs_W)],inputs_C,lengths_C)
+print(tag_scores)
+
+######################################################################
+# Variant: if a mean of the character embeddings is a good enough word
+# summary, nn.EmbeddingBag fuses the gather and the reduction into a
+# single kernel with no per-word intermediate tensor, and the character
+# LSTM disappears entirely. It reads the flat character indices plus an
+# offsets vector marking where each word starts.
+
+class LSTMTaggerWithCharBag(nn.Module):
+    def __init__(self, embedding_Wdim, embedding_Cdim, hidden_dim, vocab_size, Char_Size, tagset_size):
+        super(LSTMTaggerWithCharBag,self).__init__()
+        self.hidden_dimW = hidden_dim
+        self.word_embedding = nn.Embedding(vocab_size,embedding_Wdim)
+        self.char_embedding = nn.EmbeddingBag(Char_Size,embedding_Cdim,mode='mean')
+        self.lstmW = nn.LSTM(embedding_Wdim+embedding_Cdim, hidden_dim)
+        self.lstmW.flatten_parameters()
+        self.hidden2tag = nn.Linear(hidden_dim, tagset_size)
+
+    def forward(self,inputs_W, flat_C, offsets):
+        self.lstmW.flatten_parameters()
+        Wembeds = self.word_embedding(inputs_W)
+        # One gather-reduce kernel yields the (num_words, Cdim) summaries
+        WCs = self.char_embedding(flat_C, offsets)
+        NewWembeds = torch.cat((Wembeds,WCs),1)
+        lstm_out,_ = self.lstmW(NewWembeds.unsqueeze(1))
+        logits = self.hidden2tag(lstm_out.squeeze(1))
+        return logits
+
+model3 = LSTMTaggerWithCharBag(EMBEDDING_WDIM,EMBEDDING_CDIM,HIDDEN_DIM,len(word_to_ix),Char_Size,len(tag_to_ix))
+model3.to(device)
+flat_C = torch.cat(inputs_C)
+offsets = torch.tensor([0] + lengths_C[:-1], device=device).cumsum(0)
+model3.eval()
+with torch.inference_mode():
+    tag_scores = model3(inputs_W,flat_C,offsets)
+print(tag_scores)
@@ -7,7 +7,6 @@ a practice example for excercising with PyTorch
 
 
 import torch
-import torch.autograd as autograd
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
@@ -97,9 +96,9 @@ class NGramLanguageModeler(nn.Module):
             for context, target in n_grams:
 
                 # Step 1. Prepare the inputs to be passed to the model (i.e, turn the words
-                # into integer indices and wrap them in variables)
+                # into integer indices)
                 context_idxs = [self.word_to_ix[w] for w in context]
-                context_var = autograd.Variable(torch.LongTensor(context_idxs))
+                context_var = torch.LongTensor(context_idxs)
         
                 # Step 2. Recall that torch *accumulates* gradients. Before passing in a
                 # new instance, you need to zero out the gradients from the old
@@ -110,10 +109,9 @@ class NGramLanguageModeler(nn.Module):
                 # words
                 log_probs = self.forward(context_var)
         
-                # Step 4. Compute your loss function. (Again, Torch wants the target
-                # word wrapped in a variable)
-                loss = loss_fn(log_probs, autograd.Variable(
-                    torch.LongTensor([self.word_to_ix[target]])))
+                # Step 4. Compute your loss function
+                loss = loss_fn(log_probs,
+                               torch.LongTensor([self.word_to_ix[target]]))
         
                 # Step 5. Do the backward pass and update the gradient
                 loss.backward()
@@ -161,7 +159,7 @@ class CBOW(nn.Module):
 
     def forward(self, inputs):
         embeds = self.embeddings(inputs)
-        embedsVec = autograd.Variable(torch.zeros(embeds.size(1)))
+        embedsVec = torch.zeros(embeds.size(1))
         for i in range(embeds.size(0)):
             embedsVec += embeds[i]
         embedsVec = embedsVec.view(1,-1)
@@ -177,8 +175,7 @@ class CBOW(nn.Module):
 
 def make_context_vector(context, word_to_ix):
     idxs = [word_to_ix[w] for w in context]
-    tensor = torch.LongTensor(idxs)
-    return autograd.Variable(tensor)
+    return torch.LongTensor(idxs)
 
 
 make_context_vector(data[0][0], word_to_ix)  # example
@@ -193,7 +190,7 @@ for epoch in range(10):
         model.zero_grad()
         contextVT_ind = make_context_vector(context,word_to_ix)
         lgpb = model(contextVT_ind)
-        loss = loss_function(lgpb,autograd.Variable(torch.LongTensor([word_to_ix[target]])))
+        loss = loss_function(lgpb,torch.LongTensor([word_to_ix[target]]))
         loss.backward()
         optimizer.step()
         total_loss += loss.data